@@ -7,61 +7,367 @@ and allows playing/downloading in various formats and qualities.
 
 import os
 import uuid
+import functools
+import importlib.util
+import collections
+import concurrent.futures
 import json
+import math
+import re
+import shutil
 import subprocess
 import threading
 import time
 from pathlib import Path
 from flask import Flask, render_template, request, jsonify, send_file, Response
-import yt_dlp
 import tempfile
 
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max
+# Directory whose files may be opened in place by path (disabled when unset)
+app.config['LOCAL_MEDIA_ROOT'] = os.environ.get('MEDIA_CUTTER_LOCAL_ROOT')
 
 UPLOAD_FOLDER = Path(tempfile.gettempdir()) / 'media_cutter'
 UPLOAD_FOLDER.mkdir(exist_ok=True)
+# Least recently used sessions are evicted once UPLOAD_FOLDER exceeds this
+UPLOAD_FOLDER_LIMIT = int(os.environ.get('MEDIA_CUTTER_MAX_BYTES', 10 * 1024 ** 3))
 
 ALLOWED_EXTENSIONS = {
     'video': {'mp4', 'avi', 'mkv', 'mov', 'webm', 'flv', 'wmv', 'm4v', 'mpeg', 'mpg'},
     'audio': {'mp3', 'wav', 'aac', 'flac', 'ogg', 'm4a', 'wma', 'opus'}
 }
 
+_ALLOWED_SUFFIXES = tuple(f'.{ext}' for ext in ALLOWED_EXTENSIONS['video'] | ALLOWED_EXTENSIONS['audio'])
+
+_RANGE_RE = re.compile(r'bytes=(\d*)-(\d*)\Z')
+
+_ffmpeg_found = False
+
+def check_ffmpeg():
+    """Check that ffmpeg and ffprobe are on PATH without spawning them.
+
+    Only a positive result is remembered, so installing ffmpeg while the
+    app is running takes effect without a restart.
+    """
+    global _ffmpeg_found
+    if not _ffmpeg_found:
+        _ffmpeg_found = shutil.which('ffmpeg') is not None and shutil.which('ffprobe') is not None
+    return _ffmpeg_found
+
 def allowed_file(filename):
-    ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
-    return ext in ALLOWED_EXTENSIONS['video'] | ALLOWED_EXTENSIONS['audio']
+    return filename.lower().endswith(_ALLOWED_SUFFIXES)
+
+@functools.lru_cache(maxsize=128)
+def _probe_media(path, mtime, size):
+    """Run ffprobe on a file; cached per (path, mtime, size) so a file is probed once."""
+    cmd = [
+        'ffprobe', '-v', 'quiet', '-print_format', 'json',
+        '-show_entries', 'format=duration:stream=codec_type,codec_name,bit_rate,width,height', path
+    ]
+    # json.loads takes bytes directly, so skip text decoding; stderr is unused.
+    # check=True: a failed probe must raise rather than cache an empty result
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+    data = json.loads(result.stdout)
+    
+    duration = float(data.get('format', {}).get('duration', 0))
+    
+    has_video = any(s.get('codec_type') == 'video' for s in data.get('streams', []))
+    has_audio = any(s.get('codec_type') == 'audio' for s in data.get('streams', []))
+    
+    video_stream = next((s for s in data.get('streams', []) if s.get('codec_type') == 'video'), None)
+    width = video_stream.get('width', 0) if video_stream else 0
+    height = video_stream.get('height', 0) if video_stream else 0
+    
+    audio_stream = next((s for s in data.get('streams', []) if s.get('codec_type') == 'audio'), None)
+    audio_codec = audio_stream.get('codec_name', '') if audio_stream else ''
+    audio_bitrate = int(audio_stream.get('bit_rate', 0)) if audio_stream else 0
+    
+    return {
+        'duration': duration,
+        'has_video': has_video,
+        'has_audio': has_audio,
+        'width': width,
+        'height': height,
+        'audio_codec': audio_codec,
+        'audio_bitrate': audio_bitrate
+    }
 
 def get_media_info(filepath):
     """Get media duration and type using ffprobe."""
     try:
-        cmd = [
-            'ffprobe', '-v', 'quiet', '-print_format', 'json',
-            '-show_streams', '-show_format', str(filepath)
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        data = json.loads(result.stdout)
-        
-        duration = float(data.get('format', {}).get('duration', 0))
-        
-        has_video = any(s.get('codec_type') == 'video' for s in data.get('streams', []))
-        has_audio = any(s.get('codec_type') == 'audio' for s in data.get('streams', []))
-        
-        video_stream = next((s for s in data.get('streams', []) if s.get('codec_type') == 'video'), None)
-        width = video_stream.get('width', 0) if video_stream else 0
-        height = video_stream.get('height', 0) if video_stream else 0
-        
-        return {
-            'duration': duration,
-            'has_video': has_video,
-            'has_audio': has_audio,
-            'width': width,
-            'height': height
-        }
+        st = os.stat(filepath)
+        # Copy so callers can annotate the result without touching the cache
+        return dict(_probe_media(str(filepath), st.st_mtime, st.st_size))
     except Exception as e:
         return {'duration': 0, 'has_video': False, 'has_audio': True, 'width': 0, 'height': 0}
 
-def download_youtube(url, session_id):
-    """Download YouTube video using yt-dlp."""
+def parse_range(range_header, file_size):
+    """Parse a single-range 'bytes=start-end' header into inclusive byte offsets.
+
+    Returns None for headers that should be ignored (malformed or multi-range)
+    and raises ValueError for ranges the file cannot satisfy.
+    """
+    match = _RANGE_RE.match(range_header.strip())
+    if not match or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if not start:  # suffix range: last N bytes
+        if int(end) == 0 or file_size == 0:
+            raise ValueError('Range not satisfiable')
+        return max(0, file_size - int(end)), file_size - 1
+    start = int(start)
+    end = min(int(end), file_size - 1) if end else file_size - 1
+    if start >= file_size or start > end:
+        raise ValueError('Range not satisfiable')
+    return start, end
+
+# parse_time/format_time run a handful of times per request; keep them plain
+# Python. A JIT such as Numba costs far more in import and compile time than
+# these calls ever take, so it only makes sense for a bulk numeric scheduler.
+def parse_time(value):
+    """Parse a time given as seconds or as 'mm:ss' / 'hh:mm:ss' into seconds.
+
+    Raises ValueError for malformed, negative or non-finite times.
+    """
+    if isinstance(value, (int, float)):
+        parts = [float(value)]
+    else:
+        s = str(value).strip().replace(',', '.')
+        parts = [float(part) for part in s.split(':')] if ':' in s else [float(s)]
+    if len(parts) > 3 or not all(math.isfinite(part) and math.copysign(1, part) > 0 for part in parts):
+        raise ValueError(f'Invalid time: {value!r}')
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + part
+    return seconds
+
+def parse_end_time(value):
+    """Parse an end time, or return None when it is absent (missing, null or 0)."""
+    if value is None:
+        return None
+    return parse_time(value) or None
+
+def format_time(seconds):
+    """Format seconds as HH:MM:SS.mmm for ffmpeg time arguments."""
+    hours, rem = divmod(round(seconds, 3), 3600)
+    minutes, secs = divmod(rem, 60)
+    return f'{int(hours):02d}:{int(minutes):02d}:{secs:06.3f}'
+
+def run_ffmpeg(cmd):
+    """Run ffmpeg, keeping only the tail of stderr. Returns (ok, stderr_tail)."""
+    tail = collections.deque(maxlen=200)
+    with subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                          text=True, errors='replace') as proc:
+        for line in proc.stderr:
+            tail.append(line)
+    return proc.returncode == 0, ''.join(tail)
+
+QUALITY_PRESETS = {
+    'video': {
+        'high': ['-crf', '18', '-preset', 'slow'],
+        'medium': ['-crf', '23', '-preset', 'medium'],
+        'low': ['-crf', '28', '-preset', 'fast'],
+    },
+    'audio': {
+        'high': '320k',
+        'medium': '192k',
+        'low': '128k',
+    }
+}
+
+# Upper bound on the segments a single /cut_batch request may ask for
+MAX_BATCH_SEGMENTS = 100
+
+# Segments handled by one ffmpeg process (each becomes a separate input)
+MAX_INPUTS_PER_PROCESS = 32
+
+AUDIO_FORMATS = {'mp3', 'wav', 'aac', 'flac', 'ogg', 'm4a', 'opus'}
+VIDEO_FORMATS = {'mp4', 'webm', 'mkv', 'avi', 'mov', 'gif'}
+
+def cut_options_error(session_id, output_format, quality):
+    """Return an error message if the cut request options are invalid, else None."""
+    if not isinstance(session_id, str) or not session_id:
+        return 'session_id must be a non-empty string'
+    if output_format != 'copy' and output_format not in AUDIO_FORMATS | VIDEO_FORMATS:
+        return f'Unsupported output format: {output_format!r}'
+    if quality not in QUALITY_PRESETS['audio']:
+        return f'Unsupported quality: {quality!r}'
+    return None
+
+def dir_size(path):
+    """Total size of regular files under path; symlinked sources are not counted."""
+    total = 0
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                total += dir_size(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                total += entry.stat(follow_symlinks=False).st_size
+    return total
+
+_evict_lock = threading.Lock()
+
+def evict_old_sessions(keep=None, limit=UPLOAD_FOLDER_LIMIT):
+    """Delete the least recently used sessions until UPLOAD_FOLDER fits in limit bytes.
+
+    Sessions are ranked by directory mtime, which touch_session() refreshes
+    whenever a session's media is served.
+    """
+    if not _evict_lock.acquire(blocking=False):
+        return  # another eviction pass is already running
+    try:
+        sessions = []
+        total = 0
+        with os.scandir(UPLOAD_FOLDER) as entries:
+            for entry in entries:
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                size = dir_size(entry.path)
+                total += size
+                if entry.name != keep:
+                    sessions.append((entry.stat(follow_symlinks=False).st_mtime, size, entry.path))
+        
+        for _, size, path in sorted(sessions):
+            if total <= limit:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+    finally:
+        _evict_lock.release()
+
+def touch_session(session_dir):
+    """Mark a session as recently used so eviction keeps it."""
+    try:
+        os.utime(session_dir)
+    except OSError:
+        pass
+
+def schedule_eviction(keep=None):
+    """Run evict_old_sessions in the background so requests never wait on it."""
+    threading.Thread(target=evict_old_sessions, kwargs={'keep': keep}, daemon=True).start()
+
+def find_source(session_dir):
+    """Return the session's source file, or None if there is none."""
+    if not session_dir.is_dir():
+        return None
+    for f in session_dir.iterdir():
+        if f.stem == 'source':
+            return f
+    return None
+
+def output_args(source_file, output_format, quality, stream_copy=False):
+    """Build the ffmpeg codec arguments for an output format and quality."""
+    if stream_copy:
+        return ['-c', 'copy', '-avoid_negative_ts', 'make_zero']
+    
+    args = []
+    if output_format in AUDIO_FORMATS:
+        if output_format == 'mp3':
+            bitrate = QUALITY_PRESETS['audio'][quality]
+            info = get_media_info(source_file)
+            # Re-encoding MP3 at the same or a higher bitrate only loses
+            # quality, so copy the MP3 frames as-is when that is the case
+            if info.get('audio_codec') == 'mp3' and 0 < info.get('audio_bitrate', 0) <= int(bitrate[:-1]) * 1000:
+                args.extend(['-vn', '-acodec', 'copy'])
+            else:
+                args.extend(['-vn', '-acodec', 'libmp3lame', '-b:a', bitrate])
+        elif output_format == 'wav':
+            args.extend(['-vn', '-acodec', 'pcm_s16le'])
+        elif output_format == 'aac':
+            args.extend(['-vn', '-acodec', 'aac',
+                        '-b:a', QUALITY_PRESETS['audio'][quality]])
+        elif output_format == 'flac':
+            args.extend(['-vn', '-acodec', 'flac'])
+        elif output_format == 'ogg':
+            args.extend(['-vn', '-acodec', 'libvorbis',
+                        '-b:a', QUALITY_PRESETS['audio'][quality]])
+        elif output_format == 'm4a':
+            args.extend(['-vn', '-acodec', 'aac',
+                        '-b:a', QUALITY_PRESETS['audio'][quality]])
+        elif output_format == 'opus':
+            args.extend(['-vn', '-acodec', 'libopus',
+                        '-b:a', QUALITY_PRESETS['audio'][quality]])
+    else:
+        if output_format == 'mp4':
+            args.extend(['-vcodec', 'libx264', '-acodec', 'aac'])
+            args.extend(QUALITY_PRESETS['video'][quality])
+        elif output_format == 'webm':
+            args.extend(['-vcodec', 'libvpx-vp9', '-acodec', 'libopus'])
+            args.extend(['-crf', '33' if quality == 'low' else '23' if quality == 'medium' else '15'])
+        elif output_format == 'mkv':
+            args.extend(['-vcodec', 'libx264', '-acodec', 'aac'])
+            args.extend(QUALITY_PRESETS['video'][quality])
+        elif output_format == 'avi':
+            args.extend(['-vcodec', 'libxvid', '-acodec', 'mp3'])
+        elif output_format == 'mov':
+            args.extend(['-vcodec', 'libx264', '-acodec', 'aac'])
+            args.extend(QUALITY_PRESETS['video'][quality])
+        elif output_format == 'gif':
+            args.extend(['-vf', 'fps=10,scale=480:-1:flags=lanczos', '-loop', '0'])
+    return args
+
+def stream_maps(index, output_format):
+    """-map arguments picking one video and one audio stream of input `index`."""
+    if output_format in AUDIO_FORMATS:
+        return ['-map', f'{index}:a:0?']
+    if output_format == 'gif':
+        return ['-map', f'{index}:v:0']
+    return ['-map', f'{index}:v:0?', '-map', f'{index}:a:0?']
+
+def cut_segments(source_file, jobs, output_format, quality, stream_copy=False, threads=None):
+    """Cut (start_time, end_time, output_path) jobs with a single ffmpeg process.
+
+    Each segment gets its own fast-seeked input mapped to its own output, so
+    ffmpeg's start-up cost is paid once per batch. `threads` caps the encoder
+    threads of each output. Returns (ok, stderr_tail).
+    """
+    cmd = ['ffmpeg', '-y', '-loglevel', 'error']
+    for start_time, end_time, _ in jobs:
+        # -ss before -i seeks via the container index instead of demuxing from 0
+        cmd.extend(['-ss', format_time(start_time), '-t', format_time(end_time - start_time),
+                    '-i', str(source_file)])
+    
+    codec_args = output_args(source_file, output_format, quality, stream_copy)
+    part_paths = []
+    for index, (_, _, output_path) in enumerate(jobs):
+        if len(jobs) > 1:
+            # With several inputs, default stream selection would pick across all of them
+            cmd.extend(stream_maps(index, output_format))
+        cmd.extend(codec_args)
+        if threads:
+            cmd.extend(['-threads', str(threads)])
+        if output_path.suffix.lower() in ('.mp4', '.m4v', '.mov', '.m4a'):
+            # Move the moov atom to the front so the browser preview can start
+            # playing before the whole file has been fetched
+            cmd.extend(['-movflags', '+faststart'])
+        # Write under a temporary name (keeping the extension so ffmpeg still
+        # picks the muxer) and move it into place only once ffmpeg succeeds
+        part_path = output_path.with_name(f'{output_path.stem}.part{output_path.suffix}')
+        part_paths.append(part_path)
+        cmd.append(str(part_path))
+    
+    try:
+        ok, stderr = run_ffmpeg(cmd)
+        if ok:
+            for part_path, (_, _, output_path) in zip(part_paths, jobs):
+                os.replace(part_path, output_path)
+    finally:
+        for part_path in part_paths:
+            part_path.unlink(missing_ok=True)
+    return ok, stderr
+
+def cut_segment(source_file, output_path, start_time, end_time, output_format, quality,
+                stream_copy=False):
+    """Cut [start_time, end_time) of source_file into output_path. Returns (ok, stderr_tail)."""
+    return cut_segments(source_file, [(start_time, end_time, output_path)],
+                        output_format, quality, stream_copy)
+
+def download_youtube(url, session_id, section=None):
+    """Download YouTube video using yt-dlp, optionally only a (start, end) section."""
+    # Imported lazily: yt-dlp loads hundreds of extractors and is only
+    # needed for URL sources, not for app startup or file uploads
+    import yt_dlp
+    
     output_dir = UPLOAD_FOLDER / session_id
     output_dir.mkdir(exist_ok=True)
     output_path = output_dir / 'source.%(ext)s'
@@ -73,21 +379,21 @@ def download_youtube(url, session_id):
         'quiet': True,
         'no_warnings': True,
     }
+    if section:
+        # Fetch only the requested range instead of the whole video
+        ydl_opts['download_ranges'] = yt_dlp.utils.download_range_func(None, [section])
     
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
         info = ydl.extract_info(url, download=True)
         title = info.get('title', 'video')
     
     # Find the downloaded file
-    for f in output_dir.iterdir():
-        if f.stem == 'source':
-            return f, title
-    
-    return None, None
+    filepath = find_source(output_dir)
+    return (filepath, title) if filepath else (None, None)
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', local_media=bool(app.config['LOCAL_MEDIA_ROOT']))
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
@@ -98,12 +404,44 @@ def upload_file():
     try:
         if 'youtube_url' in request.form and request.form['youtube_url']:
             url = request.form['youtube_url'].strip()
-            filepath, title = download_youtube(url, session_id)
+            section = None
+            if request.form.get('youtube_start') or request.form.get('youtube_end'):
+                try:
+                    section_start = parse_time(request.form.get('youtube_start') or 0)
+                    youtube_end = request.form.get('youtube_end')
+                    section_end = parse_time(youtube_end) if youtube_end else float('inf')
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+                if section_end <= section_start:
+                    return jsonify({'error': 'Section end must be after start'}), 400
+                section = (section_start, section_end)
+            filepath, title = download_youtube(url, session_id, section)
             if not filepath:
                 return jsonify({'error': 'Failed to download YouTube video'}), 400
             filename = filepath.name
             media_type = 'video'
         
+        elif 'local_path' in request.form and request.form['local_path']:
+            local_root = app.config['LOCAL_MEDIA_ROOT']
+            if not local_root:
+                return jsonify({'error': 'Opening local paths is not enabled'}), 403
+            
+            local_root = Path(local_root).resolve()
+            local_path = (local_root / request.form['local_path'].strip()).resolve()
+            if not local_path.is_relative_to(local_root) or not local_path.is_file():
+                return jsonify({'error': 'File not found'}), 404
+            
+            if not allowed_file(local_path.name):
+                return jsonify({'error': 'File type not allowed'}), 400
+            
+            filename = local_path.name
+            ext = local_path.suffix.lstrip('.').lower()
+            filepath = output_dir / f'source.{ext}'
+            # Link instead of copying so large files are cut in place
+            filepath.symlink_to(local_path)
+            
+            media_type = 'video' if ext in ALLOWED_EXTENSIONS['video'] else 'audio'
+        
         elif 'file' in request.files:
             file = request.files['file']
             if not file or not file.filename:
@@ -127,7 +465,9 @@ def upload_file():
         info['session_id'] = session_id
         info['filename'] = filename
         info['media_type'] = 'video' if info['has_video'] else 'audio'
+        info['ext'] = filepath.suffix.lstrip('.').lower()
         
+        schedule_eviction(keep=session_id)
         return jsonify(info)
     
     except Exception as e:
@@ -137,16 +477,12 @@ def upload_file():
 def preview(session_id):
     """Stream the source media for preview."""
     session_dir = UPLOAD_FOLDER / session_id
-    
-    source_file = None
-    for f in session_dir.iterdir():
-        if f.stem == 'source':
-            source_file = f
-            break
+    source_file = find_source(session_dir)
     
     if not source_file:
         return jsonify({'error': 'Source file not found'}), 404
     
+    touch_session(session_dir)
     ext = source_file.suffix.lower()
     
     mime_types = {
@@ -161,12 +497,15 @@ def preview(session_id):
     
     file_size = source_file.stat().st_size
     range_header = request.headers.get('Range')
+    try:
+        byte_range = parse_range(range_header, file_size) if range_header else None
+    except ValueError:
+        response = Response(status=416)
+        response.headers['Content-Range'] = f'bytes */{file_size}'
+        return response
     
-    if range_header:
-        byte_start, byte_end = 0, None
-        match = range_header.replace('bytes=', '').split('-')
-        byte_start = int(match[0])
-        byte_end = int(match[1]) if match[1] else file_size - 1
+    if byte_range:
+        byte_start, byte_end = byte_range
         
         length = byte_end - byte_start + 1
         
@@ -188,98 +527,58 @@ def preview(session_id):
         response.headers['Content-Length'] = length
         return response
     
-    return send_file(source_file, mimetype=mime)
+    # Range was handled above; stop Werkzeug from re-parsing headers we ignored
+    return send_file(source_file, mimetype=mime, conditional=False)
 
 @app.route('/cut', methods=['POST'])
 def cut_media():
     """Cut media and convert to specified format/quality."""
+    if not check_ffmpeg():
+        return jsonify({'error': 'ffmpeg is not installed on the server'}), 500
+    
     data = request.json
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
     session_id = data.get('session_id')
-    start_time = float(data.get('start', 0))
-    end_time = float(data.get('end', 0))
+    try:
+        start_time = parse_time(data.get('start', 0))
+        end_time = parse_end_time(data.get('end'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     output_format = data.get('format', 'mp4')
     quality = data.get('quality', 'medium')
     action = data.get('action', 'download')  # 'download' or 'preview'
+    error = cut_options_error(session_id, output_format, quality)
+    if error:
+        return jsonify({'error': error}), 400
     
     session_dir = UPLOAD_FOLDER / session_id
-    source_file = None
-    for f in session_dir.iterdir():
-        if f.stem == 'source':
-            source_file = f
-            break
+    source_file = find_source(session_dir)
     
     if not source_file:
         return jsonify({'error': 'Source file not found'}), 404
     
-    output_filename = f'cut_{uuid.uuid4().hex[:8]}.{output_format}'
-    output_path = session_dir / output_filename
+    # Without an end time the cut runs to the end of the file; only then probe
+    if end_time is None:
+        end_time = get_media_info(source_file)['duration']
+    if end_time <= start_time:
+        return jsonify({'error': 'End time must be after start time'}), 400
     
-    duration = end_time - start_time
-    
-    # Quality presets
-    quality_presets = {
-        'video': {
-            'high': ['-crf', '18', '-preset', 'slow'],
-            'medium': ['-crf', '23', '-preset', 'medium'],
-            'low': ['-crf', '28', '-preset', 'fast'],
-        },
-        'audio': {
-            'high': '320k',
-            'medium': '192k',
-            'low': '128k',
-        }
-    }
-    
-    audio_formats = {'mp3', 'wav', 'aac', 'flac', 'ogg', 'm4a', 'opus'}
-    is_audio_output = output_format in audio_formats
-    
-    cmd = ['ffmpeg', '-y', '-ss', str(start_time), '-i', str(source_file),
-           '-t', str(duration)]
+    # 'copy' keeps the source container and remuxes without re-encoding
+    stream_copy = output_format == 'copy'
+    if stream_copy:
+        output_format = source_file.suffix.lstrip('.').lower()
     
-    if is_audio_output:
-        if output_format == 'mp3':
-            cmd.extend(['-vn', '-acodec', 'libmp3lame',
-                       '-b:a', quality_presets['audio'][quality]])
-        elif output_format == 'wav':
-            cmd.extend(['-vn', '-acodec', 'pcm_s16le'])
-        elif output_format == 'aac':
-            cmd.extend(['-vn', '-acodec', 'aac',
-                       '-b:a', quality_presets['audio'][quality]])
-        elif output_format == 'flac':
-            cmd.extend(['-vn', '-acodec', 'flac'])
-        elif output_format == 'ogg':
-            cmd.extend(['-vn', '-acodec', 'libvorbis',
-                       '-b:a', quality_presets['audio'][quality]])
-        elif output_format == 'm4a':
-            cmd.extend(['-vn', '-acodec', 'aac',
-                       '-b:a', quality_presets['audio'][quality]])
-        elif output_format == 'opus':
-            cmd.extend(['-vn', '-acodec', 'libopus',
-                       '-b:a', quality_presets['audio'][quality]])
-    else:
-        if output_format == 'mp4':
-            cmd.extend(['-vcodec', 'libx264', '-acodec', 'aac'])
-            cmd.extend(quality_presets['video'][quality])
-        elif output_format == 'webm':
-            cmd.extend(['-vcodec', 'libvpx-vp9', '-acodec', 'libopus'])
-            cmd.extend(['-crf', '33' if quality == 'low' else '23' if quality == 'medium' else '15'])
-        elif output_format == 'mkv':
-            cmd.extend(['-vcodec', 'libx264', '-acodec', 'aac'])
-            cmd.extend(quality_presets['video'][quality])
-        elif output_format == 'avi':
-            cmd.extend(['-vcodec', 'libxvid', '-acodec', 'mp3'])
-        elif output_format == 'mov':
-            cmd.extend(['-vcodec', 'libx264', '-acodec', 'aac'])
-            cmd.extend(quality_presets['video'][quality])
-        elif output_format == 'gif':
-            cmd.extend(['-vf', 'fps=10,scale=480:-1:flags=lanczos', '-loop', '0'])
+    output_filename = f'cut_{uuid.uuid4().hex[:8]}.{output_format}'
+    output_path = session_dir / output_filename
     
-    cmd.append(str(output_path))
+    ok, stderr = cut_segment(source_file, output_path, start_time, end_time,
+                             output_format, quality, stream_copy)
     
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    if not ok:
+        return jsonify({'error': f'FFmpeg error: {stderr}'}), 500
     
-    if result.returncode != 0:
-        return jsonify({'error': f'FFmpeg error: {result.stderr}'}), 500
+    schedule_eviction(keep=session_id)
     
     if action == 'preview':
         cut_id = output_filename.replace(f'.{output_format}', '')
@@ -299,6 +598,105 @@ def cut_media():
         download_name=output_filename
     )
 
+@app.route('/cut_batch', methods=['POST'])
+def cut_batch():
+    """Cut several segments of one source, batching them into few ffmpeg processes."""
+    if not check_ffmpeg():
+        return jsonify({'error': 'ffmpeg is not installed on the server'}), 500
+    
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    session_id = data.get('session_id')
+    output_format = data.get('format', 'mp4')
+    quality = data.get('quality', 'medium')
+    error = cut_options_error(session_id, output_format, quality)
+    if error:
+        return jsonify({'error': error}), 400
+    raw_segments = data.get('segments')
+    if not isinstance(raw_segments, list) or not all(isinstance(seg, dict) for seg in raw_segments):
+        return jsonify({'error': 'segments must be a list of {start, end} objects'}), 400
+    if not raw_segments:
+        return jsonify({'error': 'No segments provided'}), 400
+    if len(raw_segments) > MAX_BATCH_SEGMENTS:
+        return jsonify({'error': f'At most {MAX_BATCH_SEGMENTS} segments per batch'}), 400
+    try:
+        segments = [(parse_time(seg.get('start', 0)), parse_end_time(seg.get('end')))
+                    for seg in raw_segments]
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    session_dir = UPLOAD_FOLDER / session_id
+    source_file = find_source(session_dir)
+    
+    if not source_file:
+        return jsonify({'error': 'Source file not found'}), 404
+    
+    # The probe is cached from the upload; use it to reject segments ffmpeg
+    # would fail on before any process starts. Segments without an end run
+    # to the end of the file
+    duration = get_media_info(source_file)['duration']
+    for i, (start, end) in enumerate(segments):
+        if end is None:
+            end = duration
+            segments[i] = (start, end)
+        if duration and start >= duration:
+            return jsonify({'error': f'Segment {i + 1}: starts after the end of the media'}), 400
+        if end <= start:
+            return jsonify({'error': f'Segment {i + 1}: end time must be after start time'}), 400
+    
+    stream_copy = output_format == 'copy'
+    if stream_copy:
+        output_format = source_file.suffix.lstrip('.').lower()
+    
+    jobs = [(start, end, session_dir / f'cut_{uuid.uuid4().hex[:8]}.{output_format}')
+            for start, end in segments]
+    
+    if stream_copy:
+        # Stream copies are cheap and I/O bound: batch them into few processes
+        # (at most MAX_INPUTS_PER_PROCESS inputs each, bounding argv, open
+        # files and input threads) and run those one at a time
+        workers = 1
+        groups = [jobs[i:i + MAX_INPUTS_PER_PROCESS]
+                  for i in range(0, len(jobs), MAX_INPUTS_PER_PROCESS)]
+        threads = None
+    else:
+        # Encoding dwarfs process start-up, so give every re-encode its own
+        # process; a failing segment then never costs the others a rerun.
+        # Split the cores between the parallel encoders instead of letting
+        # each one spawn a thread per core
+        workers = min(8, os.cpu_count() or 1, len(jobs))
+        groups = [[job] for job in jobs]
+        threads = max(1, (os.cpu_count() or 1) // workers)
+    
+    def run_group(group):
+        ok, stderr = cut_segments(source_file, group, output_format, quality,
+                                  stream_copy, threads)
+        if ok or len(group) == 1:
+            return [(ok, stderr)] * len(group)
+        # One bad segment fails the whole process; redo the group one segment
+        # at a time (cheap, as only stream copies are grouped) so each cut
+        # reports its own outcome
+        return [cut_segments(source_file, [job], output_format, quality, stream_copy, threads)
+                for job in group]
+    
+    # Each group is an ffmpeg subprocess, so threads are enough to run them concurrently
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        results = [result for group_results in executor.map(run_group, groups)
+                   for result in group_results]
+    
+    cuts = []
+    for (start, end, output_path), (ok, stderr) in zip(jobs, results):
+        cut = {'start': start, 'end': end}
+        if ok:
+            cut['filename'] = output_path.name
+        else:
+            cut['error'] = f'FFmpeg error: {stderr}'
+        cuts.append(cut)
+    
+    schedule_eviction(keep=session_id)
+    return jsonify({'session_id': session_id, 'cuts': cuts})
+
 @app.route('/download/<session_id>/<filename>')
 def download_cut(session_id, filename):
     """Download a previously cut file."""
@@ -306,6 +704,7 @@ def download_cut(session_id, filename):
     if not filepath.exists():
         return jsonify({'error': 'File not found'}), 404
     
+    touch_session(filepath.parent)
     ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
     mime_types = {
         'mp4': 'video/mp4', 'webm': 'video/webm', 'mkv': 'video/x-matroska',
@@ -328,6 +727,7 @@ def stream_cut(session_id, filename):
     if not filepath.exists():
         return jsonify({'error': 'File not found'}), 404
     
+    touch_session(filepath.parent)
     ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
     mime_types = {
         'mp4': 'video/mp4', 'webm': 'video/webm',
@@ -338,12 +738,15 @@ def stream_cut(session_id, filename):
     
     file_size = filepath.stat().st_size
     range_header = request.headers.get('Range')
+    try:
+        byte_range = parse_range(range_header, file_size) if range_header else None
+    except ValueError:
+        response = Response(status=416)
+        response.headers['Content-Range'] = f'bytes */{file_size}'
+        return response
     
-    if range_header:
-        byte_start, byte_end = 0, None
-        match = range_header.replace('bytes=', '').split('-')
-        byte_start = int(match[0])
-        byte_end = int(match[1]) if match[1] else file_size - 1
+    if byte_range:
+        byte_start, byte_end = byte_range
         length = byte_end - byte_start + 1
         
         def generate():
@@ -363,12 +766,12 @@ def stream_cut(session_id, filename):
         response.headers['Content-Length'] = length
         return response
     
-    return send_file(filepath, mimetype=mime)
+    # Range was handled above; stop Werkzeug from re-parsing headers we ignored
+    return send_file(filepath, mimetype=mime, conditional=False)
 
 @app.route('/cleanup/<session_id>', methods=['DELETE'])
 def cleanup(session_id):
     """Clean up session files."""
-    import shutil
     session_dir = UPLOAD_FOLDER / session_id
     if session_dir.exists():
         shutil.rmtree(session_dir)
@@ -402,6 +805,7 @@ h1 span { color: #0f3460; }
 .url-row { display: flex; gap: 10px; margin-top: 15px; }
 .url-row input { flex: 1; background: #0f3460; border: 1px solid #1a4a8a; color: #eee; padding: 10px 15px; border-radius: 8px; font-size: 0.95rem; }
 .url-row input:focus { outline: none; border-color: #e94560; }
+.url-row input.section-time { flex: 0 0 110px; }
 
 btn { display: inline-block; padding: 10px 20px; border-radius: 8px; border: none; cursor: pointer; font-size: 0.9rem; font-weight: 600; transition: all 0.2s; }
 .btn-primary { background: #e94560; color: #fff; }
@@ -466,6 +870,7 @@ canvas#waveform { width: 100%; height: 100%; display: block; }
 
 @media (max-width: 600px) {
   .time-inputs, .options-grid { grid-template-columns: 1fr; }
+  .url-row { flex-wrap: wrap; }
   .action-row { flex-direction: column; }
   .action-row button { width: 100%; }
 }
@@ -485,8 +890,16 @@ canvas#waveform { width: 100%; height: 100%; display: block; }
     </div>
     <div class="url-row">
       <input type="text" id="youtubeUrl" placeholder="Or paste YouTube URL...">
+      <input type="text" id="youtubeStart" class="section-time" placeholder="From (opt.)">
+      <input type="text" id="youtubeEnd" class="section-time" placeholder="To (opt.)">
       <button class="btn-primary" onclick="loadYouTube()">▶ Load</button>
     </div>
+    {% if local_media %}
+    <div class="url-row">
+      <input type="text" id="localPath" placeholder="Or open a file on the server by path...">
+      <button class="btn-primary" onclick="loadLocal()">📂 Open</button>
+    </div>
+    {% endif %}
     <div class="progress-bar" id="uploadProgress"><div class="fill"></div></div>
     <div id="uploadStatus"></div>
   </div>
@@ -544,6 +957,9 @@ canvas#waveform { width: 100%; height: 100%; display: block; }
               <option value="mov">MOV</option>
               <option value="gif">GIF (animation)</option>
             </optgroup>
+            <optgroup label="Original">
+              <option value="copy">Same as source (no re-encode)</option>
+            </optgroup>
             <optgroup label="Audio">
               <option value="mp3">MP3</option>
               <option value="aac">AAC</option>
@@ -600,6 +1016,7 @@ let startTime = 0;
 let endTime = 0;
 let isDragging = null;
 let mediaType = 'video';
+let sourceExt = null;
 let lastCutFile = null;
 let lastCutFormat = null;
 
@@ -641,9 +1058,22 @@ async function loadYouTube() {
   if (!url) return;
   const formData = new FormData();
   formData.append('youtube_url', url);
+  // Optional section: only this range is downloaded
+  const from = document.getElementById('youtubeStart').value.trim();
+  const to = document.getElementById('youtubeEnd').value.trim();
+  if (from) formData.append('youtube_start', from);
+  if (to) formData.append('youtube_end', to);
   await doUpload(formData, 'Downloading from YouTube...');
 }
 
+async function loadLocal() {
+  const path = document.getElementById('localPath').value.trim();
+  if (!path) return;
+  const formData = new FormData();
+  formData.append('local_path', path);
+  await doUpload(formData, 'Opening file...');
+}
+
 async function doUpload(formData, loadingMsg = 'Uploading...') {
   showStatus('uploadStatus', loadingMsg, 'info');
   document.getElementById('uploadProgress').style.display = 'block';
@@ -661,6 +1091,7 @@ async function doUpload(formData, loadingMsg = 'Uploading...') {
     sessionId = data.session_id;
     duration = data.duration;
     mediaType = data.has_video ? 'video' : 'audio';
+    sourceExt = data.ext;
     startTime = 0;
     endTime = duration;
     
@@ -847,7 +1278,7 @@ function formatTime(s) {
 
 function updateFormatOptions() {
   const fmt = document.getElementById('outputFormat').value;
-  const lossless = ['wav', 'flac'].includes(fmt);
+  const lossless = ['wav', 'flac', 'copy'].includes(fmt);
   const gif = fmt === 'gif';
   const qGroup = document.getElementById('qualityGroup');
   qGroup.style.opacity = (lossless || gif) ? '0.4' : '1';
@@ -858,7 +1289,8 @@ function updateFormatOptions() {
 async function cutMedia(action) {
   if (!sessionId) return;
   
-  const format = document.getElementById('outputFormat').value;
+  const formatChoice = document.getElementById('outputFormat').value;
+  const format = formatChoice === 'copy' ? sourceExt : formatChoice;
   const quality = document.getElementById('outputQuality').value;
   
   const progressEl = document.getElementById('cutProgress');
@@ -877,7 +1309,7 @@ async function cutMedia(action) {
         session_id: sessionId,
         start: startTime,
         end: endTime,
-        format: format,
+        format: formatChoice,
         quality: quality,
         action: action
       })
@@ -969,7 +1401,12 @@ with open(templates_dir / 'index.html', 'w') as f:
 
 if __name__ == '__main__':
     print("Starting Media Cutter...")
-    print("Make sure ffmpeg and yt-dlp are installed:")
-    print("  sudo apt install ffmpeg  OR  brew install ffmpeg")
-    print("  pip install yt-dlp flask")
+    if not check_ffmpeg():
+        print("ffmpeg/ffprobe not found on PATH. Install them with:")
+        print("  sudo apt install ffmpeg  OR  brew install ffmpeg")
+    if importlib.util.find_spec('yt_dlp') is None:
+        print("yt-dlp not found; loading YouTube URLs will fail. Install it with:")
+        print("  pip install yt-dlp flask")
+    # Trim what previous runs left behind in the temp directory
+    schedule_eviction()
     app.run(debug=True, host='0.0.0.0', port=5040)